@@ -1,5 +1,7 @@
+import os
 import streamlit as st
 import pandas as pd
+import numpy as np
 import altair as alt
 import yfinance as yf
 import plotly.graph_objects as go
@@ -16,88 +18,173 @@ st.set_page_config(
 st.subheader("📈 Momentum Investing Portfolio Dashboard")
 st.info("Updated on 2025-08-31")
 
-df = pd.read_csv("dataa.csv")
-df["current_date"] = pd.to_datetime(df["current_date"])
-df = df.sort_values("current_date").set_index("current_date")
+# ----------------------------
+# Data Loading
+# ----------------------------
+# The file mtime is part of the cache key so edits to the CSV invalidate the cache.
+@st.cache_data
+def load_df(path, mtime):
+    df = pd.read_csv(path, engine="pyarrow", parse_dates=["current_date"])
+    # Sort exactly once here; a stable sort keeps same-day rows in file order
+    df.sort_values("current_date", kind="mergesort", inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    # Few distinct values repeated on every row; comparisons run on integer codes
+    df["status"] = df["status"].astype("category")
+    df["ticker"] = df["ticker"].astype("category")
+    return df
+
+
+# Dates (not timestamps) keep the key stable across reruns within a day.
+@st.cache_data(ttl=60 * 60)
+def fetch_benchmark(ticker, start, end):
+    # yfinance reports failures by returning an empty frame; raise instead so the
+    # empty result is not cached for the whole ttl
+    data = yf.download(ticker, start=start, end=end)
+    if data.empty:
+        raise ValueError(f"No benchmark data returned for {ticker}")
+    return data["Close"]
+
+
+# One value per day; drawdown and every return series are computed from this.
+# load_df already sorts by date, so the groupby can skip its own sort.
+@st.cache_data
+def load_portfolio_values(path, mtime):
+    df = load_df(path, mtime)
+    return df.groupby("current_date", sort=False)["total_portfolio_value"].last()
+
+
+def compute_drawdown(values):
+    values = np.asarray(values, dtype=np.float64)
+    running_max = np.maximum.accumulate(values)
+    return values / running_max - 1.0
+
+
+# Streamlit hashes the Series contents, so reruns with unchanged data get the
+# same Figure back instead of reassembling it. Only the current figure is kept.
+@st.cache_resource(max_entries=1)
+def build_benchmark_fig(port_cum, bench_cum):
+    # Copy once, then convert growth factors to percent returns in place
+    port_pct = port_cum.to_numpy(dtype=np.float64, copy=True)
+    port_pct -= 1.0
+    port_pct *= 100.0
+    bench_pct = bench_cum.to_numpy(dtype=np.float64, copy=True)
+    bench_pct -= 1.0
+    bench_pct *= 100.0
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=port_cum.index, y=port_pct, name="Portfolio", line_color="blue"))
+    fig.add_trace(go.Scatter(x=bench_cum.index, y=bench_pct, name="Benchmark", line_color="orange"))
+    fig.update_layout(
+        title="Cumulative Returns (Strategy vs Nifty 500)",
+        xaxis_title="Date",
+        yaxis_title="Return %",
+        legend=dict(
+            orientation="h",   # horizontal
+            yanchor="bottom",
+            y=-0.3,            # move legend further down
+            xanchor="center",
+            x=0.5
+        )
+    )
+    return fig
+
+
+# Chart specs are compiled from Altair to Vega-Lite once and cached. They carry
+# no data: the frames go to st.vega_lite_chart separately, through Streamlit's
+# Arrow serialization rather than Altair's inline JSON (capped at 5000 rows).
+@st.cache_data
+def monthly_chart_spec():
+    return (
+        alt.Chart()
+        .mark_bar()
+        .encode(
+            x=alt.X("current_date:T", title="Month"),
+            y=alt.Y("monthly_return:Q", title="Monthly Return", axis=alt.Axis(format="%")),
+            color=alt.Color("color:N", scale=None, legend=None),
+            tooltip=["current_date:T", alt.Tooltip("monthly_return:Q", format=".2%")]
+        )
+        .properties(title="Monthly Returns", height=300)
+    ).to_dict()
 
-portfolio = df.groupby("current_date")["total_portfolio_value"].last()
-portfolio_returns = portfolio.pct_change().dropna()
 
+# Bar chart version of drawdown
+@st.cache_data
+def dd_chart_spec(date_column):
+    return alt.Chart().mark_bar(color="red").encode(
+        x=alt.X(f"{date_column}:T", title="Date"),
+        y=alt.Y("drawdown:Q", title="Drawdown", axis=alt.Axis(format="%"), scale=alt.Scale(domain=[-1, 0])),
+        tooltip=[f"{date_column}:T", alt.Tooltip("drawdown:Q", format=".2%")]
+    ).properties(
+        title="Drawdown (Underwater Plot)",
+        height=300
+    ).to_dict()
 
-from datetime import datetime, timedelta
-end_date = max(portfolio.index.max(), datetime.now())
-
-benchmark = yf.download("^CRSLDX", 
-                       start=portfolio.index.min(), 
-                       end=end_date + timedelta(days=30))["Close"] 
-benchmark_monthly = benchmark.resample("ME").last()
-benchmark_returns = benchmark_monthly.pct_change().dropna()
-
-port_ret, bench_ret = portfolio_returns.align(benchmark_returns, join="inner")
-
-if hasattr(bench_ret, 'squeeze'):
-    bench_ret = bench_ret.squeeze()
-
-port_cum = (1 + port_ret).cumprod()
-bench_cum = (1 + bench_ret).cumprod()
-
-fig = go.Figure()
-fig.add_trace(go.Scatter(x=port_cum.index, y=(port_cum-1)*100, name="Portfolio", line_color="blue"))
-fig.add_trace(go.Scatter(x=bench_cum.index, y=(bench_cum-1)*100, name="Benchmark", line_color="orange"))
-fig.update_layout(title="Cumulative Returns (%)", xaxis_title="Date", yaxis_title="Return %")
-
-
-fig.update_layout(
-    title="Cumulative Returns (Strategy vs Nifty 500)",
-    xaxis_title="Date",
-    yaxis_title="Return %",
-    legend=dict(
-        orientation="h",   # horizontal
-        yanchor="bottom",
-        y=-0.3,            # move legend further down
-        xanchor="center",
-        x=0.5
-    )
-)
 
+data_path = "dataa.csv"
+data_mtime = os.path.getmtime(data_path)
 
-st.plotly_chart(fig, use_container_width=True)
+date_column = "current_date"
+main_df = load_df(data_path, data_mtime)
+portfolio_values = load_portfolio_values(data_path, data_mtime)
 
+portfolio_returns = portfolio_values.pct_change().dropna()
 
-main_df = pd.read_csv("dataa.csv")
 
-date_column = "current_date"  
-main_df[date_column] = pd.to_datetime(main_df[date_column])
-main_df = main_df.sort_values(by=date_column).reset_index(drop=True)
-main_df["total_portfolio_value"] = pd.to_numeric(main_df["total_portfolio_value"], errors="coerce")
+from datetime import datetime, timedelta
+end_date = max(portfolio_values.index.max(), datetime.now())
+
+try:
+    benchmark = fetch_benchmark("^CRSLDX",
+                                start=portfolio_values.index.min().date(),
+                                end=(end_date + timedelta(days=30)).date())
+except Exception as e:
+    benchmark = None
+    st.warning(f"⚠️ Benchmark comparison unavailable: {str(e)}")
+
+# The rest of the page does not depend on the benchmark, so skip only this section
+if benchmark is not None:
+    # Daily closes are already unique per date, so sample them at calendar month-ends
+    # (the dates the portfolio is marked on) instead of building a resample grouper.
+    # The range runs to the month-end containing the last close, so a month whose
+    # final trading day falls before a weekend/holiday month-end is still kept.
+    month_ends = pd.date_range(benchmark.index.min(),
+                               benchmark.index.max() + pd.offsets.MonthEnd(0),
+                               freq="ME")
+    benchmark_monthly = benchmark.reindex(month_ends, method="ffill")
+    benchmark_returns = benchmark_monthly.pct_change().dropna()
+
+    # Newer yfinance returns a one-column frame per ticker
+    if isinstance(benchmark_returns, pd.DataFrame):
+        benchmark_returns = benchmark_returns.iloc[:, 0]
+
+    # Compound both return series together on their shared dates
+    aligned = pd.concat([portfolio_returns, benchmark_returns], axis=1, join="inner")
+    aligned.columns = ["port", "bench"]
+    cum = (1 + aligned).cumprod()
+    port_cum, bench_cum = cum["port"], cum["bench"]
+
+    fig = build_benchmark_fig(port_cum, bench_cum)
+    st.plotly_chart(fig, use_container_width=True)
+
 
 # ----------------------------
 # Metrics Calculations
 # ----------------------------
-portfolio_value = main_df["total_portfolio_value"]
+# Endpoints come straight from the per-day array; it also feeds the drawdown scan
+values = portfolio_values.to_numpy()
+first_value, last_value = values[0], values[-1]
 
+total_return = last_value / first_value - 1
 
-total_return = (portfolio_value.iloc[-1] / portfolio_value.iloc[0]) - 1
-portfolio_history = pd.read_csv('dataa.csv')
-portfolio_history[date_column] = pd.to_datetime(portfolio_history[date_column])
-if date_column in portfolio_history.columns:
-    days = (portfolio_history[date_column].iloc[-1] - portfolio_history[date_column].iloc[0]).days
-    years = days / 365.25
-    print(f"Investment period: {years:.2f} years")
-else:
-    years = n_periods / 252  # Assuming 252 trading days per year
-
-cagr = (portfolio_value.iloc[-1] / portfolio_value.iloc[0]) ** (1 / years) - 1
-
-
-days = (main_df[date_column].iloc[-1] - main_df[date_column].iloc[0]).days
+days = (portfolio_values.index[-1] - portfolio_values.index[0]).days
 years = days / 365.25
-cagr = (portfolio_value.iloc[-1] / portfolio_value.iloc[0]) ** (1 / years) - 1
 
-running_max = portfolio_value.cummax()
-drawdown = (portfolio_value - running_max) / running_max
-max_drawdown = drawdown.min()
-sharpe_ratio = cagr/-max_drawdown
+cagr = (last_value / first_value) ** (1 / years) - 1 if years > 0 else 0.0
+
+drawdown = compute_drawdown(values)
+max_drawdown = float(drawdown.min())
+# A history that never drew down would otherwise divide by zero
+sharpe_ratio = 0.0 if max_drawdown == 0 else cagr / abs(max_drawdown)
 
 # ----------------------------
 # Layout
@@ -118,16 +205,14 @@ col4.metric("Sharpe Ratio",f"{sharpe_ratio:.2}")
 st.divider()
 
 
-date = main_df[date_column].sort_values(ascending=False).tolist()
-
-
-main_df["my_date"] = pd.to_datetime(main_df[date_column])
-latest_date = main_df["my_date"].max()
-
-
-latest_data = main_df[main_df["my_date"] == latest_date]
-only_data = latest_data[latest_data["status"] == "Held"]
-data_to_show = only_data[["ticker","shares_qty","bought_price","current_price","current_value"]]
+# main_df is sorted by date, so the latest day's rows form its tail
+latest_date = main_df[date_column].iloc[-1]
+latest_start = main_df[date_column].searchsorted(latest_date, side="left")
+latest_data = main_df.iloc[latest_start:]
+data_to_show = latest_data.loc[
+    latest_data["status"] == "Held",
+    ["ticker","shares_qty","bought_price","current_price","current_value"]
+]
 st.subheader("Current Holding")
 st.dataframe(data_to_show)
 
@@ -137,100 +222,55 @@ st.dataframe(data_to_show)
 st.subheader("Performance Visualizations")
 
 # ---- Monthly Returns ----
-monthly_returns = (
-    main_df.resample("M", on=date_column)["total_portfolio_value"]
-    .last()
-    .pct_change()
-    .dropna()
-)
+monthly_values = portfolio_values.resample("ME").last()
+monthly_returns = (monthly_values / monthly_values.shift(1) - 1).dropna()
 
 monthly_df = monthly_returns.reset_index().rename(columns={"total_portfolio_value": "monthly_return"})
-monthly_df["color"] = monthly_df["monthly_return"].apply(lambda x: "green" if x > 0 else "red")
-
-monthly_chart = (
-    alt.Chart(monthly_df)
-    .mark_bar()
-    .encode(
-        x=alt.X("current_date:T", title="Month"),
-        y=alt.Y("monthly_return:Q", title="Monthly Return", axis=alt.Axis(format="%")),
-        color=alt.Color("color:N", scale=None, legend=None),
-        tooltip=["current_date", alt.Tooltip("monthly_return", format=".2%")]
-    )
-    .properties(title="Monthly Returns", height=300)
-)
+monthly_df["color"] = np.where(monthly_df["monthly_return"].to_numpy() > 0, "green", "red")
+
 
 # ---- Yearly Returns ----
-yearly_returns = (
-    main_df.resample("Y", on=date_column)["total_portfolio_value"]
-    .last()
-    .pct_change()
-    .dropna()
-)
+yearly_values = portfolio_values.resample("YE").last()
+yearly_returns = (yearly_values / yearly_values.shift(1) - 1).dropna()
 yearly_df = yearly_returns.reset_index().rename(columns={"total_portfolio_value": "yearly_return"})
-yearly_df["year"] = yearly_df["current_date"].dt.year
+
+# One base chart so the three layers share a single inline dataset;
+# the year is derived in Vega rather than stored as an extra column
+yearly_base = alt.Chart(yearly_df).transform_calculate(
+    year="year(datum.current_date)"
+).encode(
+    x=alt.X("year:O", title="Year"),
+    y=alt.Y("yearly_return:Q", title="Yearly Return", axis=alt.Axis(format="%")),
+    tooltip=[alt.Tooltip("year:O", title="Year"), alt.Tooltip("yearly_return", format=".2%")]
+)
 
 yearly_chart = (
-    alt.Chart(yearly_df)
-    .mark_line(color="darkorange", interpolate="monotone", strokeWidth=3)
-    .encode(
-        x=alt.X("year:O", title="Year"),
-        y=alt.Y("yearly_return:Q", title="Yearly Return", axis=alt.Axis(format="%")),
-        tooltip=[alt.Tooltip("year:O", title="Year"), alt.Tooltip("yearly_return", format=".2%")]
+    yearly_base.mark_line(color="darkorange", interpolate="monotone", strokeWidth=3)
+    + yearly_base.mark_point(size=80, filled=True, color="darkorange")
+    + yearly_base.mark_text(align="center", dy=-10, color="black").encode(
+        text=alt.Text("yearly_return:Q", format=".1%")
     )
-    .properties(title="Yearly Returns", height=300)
-    +
-    alt.Chart(yearly_df)
-    .mark_point(size=80, filled=True, color="darkorange")
-    .encode(x="year:O", y="yearly_return:Q", tooltip=["year", alt.Tooltip("yearly_return", format=".2%")])
-    +
-    alt.Chart(yearly_df)
-    .mark_text(align="center", dy=-10, color="black")
-    .encode(x="year:O", y="yearly_return:Q", text=alt.Text("yearly_return:Q", format=".1%"))
-)
+).properties(title="Yearly Returns", height=300)
 
 # ---- Drawdown Chart ----
 # ---- Drawdown Calculation ----
-main_df = main_df.sort_values(by=date_column).reset_index(drop=True)
-
-# Running max
-# Ensure numeric
-main_df["total_portfolio_value"] = pd.to_numeric(main_df["total_portfolio_value"], errors="coerce")
-main_df[date_column] = pd.to_datetime(main_df[date_column])
-
-# Sort by date to avoid misaligned cummax
-main_df = main_df.sort_values(by=date_column).reset_index(drop=True)
-
-# Keep only last value per day (if duplicates exist)
-main_df = main_df.groupby(date_column, as_index=False).last()
-
-# Drawdown calculation
-running_max = main_df["total_portfolio_value"].cummax()
-drawdown = main_df["total_portfolio_value"] / running_max - 1
+# portfolio_values already holds the last value per day, and drawdown was
+# computed from it in the metrics section, so no per-day dedupe is needed here.
 
 # DataFrame for plotting
 dd_df = pd.DataFrame({
-    date_column: main_df[date_column],
+    date_column: portfolio_values.index,
     "drawdown": drawdown
 })
 
-# Bar chart version of drawdown
-dd_chart = alt.Chart(dd_df).mark_bar(color="red").encode(
-    x=alt.X(f"{date_column}:T", title="Date"),
-    y=alt.Y("drawdown:Q", title="Drawdown", axis=alt.Axis(format="%"), scale=alt.Scale(domain=[-1, 0])),
-    tooltip=[date_column, alt.Tooltip("drawdown", format=".2%")]
-).properties(
-    title="Drawdown (Underwater Plot)",
-    height=300
-)
-
 
 
 # ----------------------------
 # Show Charts
 # ----------------------------
-st.altair_chart(monthly_chart, use_container_width=True)
+st.vega_lite_chart(monthly_df, monthly_chart_spec(), use_container_width=True)
 #st.altair_chart(yearly_chart, use_container_width=True)
-st.altair_chart(dd_chart, use_container_width=True)
+st.vega_lite_chart(dd_df, dd_chart_spec(date_column), use_container_width=True)
 
 # ----------------------------
 # Yearly Returns Table
@@ -238,7 +278,10 @@ st.altair_chart(dd_chart, use_container_width=True)
 st.subheader("📊 Yearly Returns Summary")
 
 # prepare DataFrame first
-df_display = yearly_df[["year", "yearly_return"]].reset_index(drop=True)
+df_display = pd.DataFrame({
+    "year": yearly_df["current_date"].dt.year,
+    "yearly_return": yearly_df["yearly_return"]
+})
 
 # optional CSS to center and enlarge table font
 st.markdown("""
@@ -249,14 +292,14 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # create a Styler (formatting + optional color)
-def color_return(val):
-    return "color: green; font-weight:600" if val >= 0 else "color: red; font-weight:600"
+def color_return(col):
+    return np.where(col.to_numpy() >= 0, "color: green; font-weight:600", "color: red; font-weight:600")
 
 styled = (
     df_display
     .style
     .format({"yearly_return": "{:.2%}"})
-    .applymap(color_return, subset=["yearly_return"])
+    .apply(color_return, subset=["yearly_return"])
 )
 
 st.dataframe(styled, use_container_width=True)